@@ -0,0 +1,105 @@
+
+# api/cache.py
+"""
+In-process LRU object cache backend.
+
+Django's default LocMemCache pickles every value on set() and unpickles on
+get(); for the large nested dicts MusicBrainz returns, that copy cost
+dominates the lookup. This backend keeps plain object references in an
+OrderedDict, so get() is a dict lookup, and evicts least-recently-used
+entries in O(1) once MAX_ENTRIES is reached (LocMemCache culls in batches
+instead). Cached values are shared, not copies — callers must treat them as
+read-only.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Keyed by LOCATION so separate cache aliases don't share entries.
+_caches = {}
+_locks = {}
+
+# Sentinel distinguishing 'absent' from a cached None.
+_MISSING = object()
+
+
+class LRUObjectCache(BaseCache):
+    def __init__(self, name, params):
+        super().__init__(params)
+        self._cache = _caches.setdefault(name, OrderedDict())
+        self._lock = _locks.setdefault(name, Lock())
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._peek(key) is not _MISSING:
+                return False
+            self._store(key, value, timeout)
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            value = self._peek(key)
+            if value is _MISSING:
+                return default
+            self._cache.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._peek(key) is _MISSING:
+                return False
+            value = self._cache[key][0]
+            self._store(key, value, timeout)
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._cache.pop(key, None) is not None
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._peek(key) is not _MISSING
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def validate_key(self, key):
+        # Keys never leave this process, so memcached's length and
+        # character restrictions (spaces, control chars) don't apply.
+        pass
+
+    # -- internals (lock must be held) --
+
+    def _peek(self, key):
+        """Return the live value for key without touching LRU order."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return _MISSING
+        value, expiry = entry
+        if expiry is not None and expiry <= time.monotonic():
+            del self._cache[key]
+            return _MISSING
+        return value
+
+    def _store(self, key, value, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        # get_backend_timeout returns an absolute time.time() deadline;
+        # convert to a monotonic deadline so clock changes can't expire us.
+        expiry = None if timeout is None else time.monotonic() + (timeout - time.time())
+        self._cache[key] = (value, expiry)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
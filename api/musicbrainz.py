@@ -1,51 +1,117 @@
 
 # api/musicbrainz.py
 import os
+import re
+import json
 import time
+import random
 import requests
-import hashlib
 from typing import Optional
 from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 
 USER_AGENT = os.getenv("MB_USER_AGENT", "NextTrack/0.1 (your-email@example.com)")
 BASE_URL = "https://musicbrainz.org/ws/2/recording/"
 CACHE_TTL = 60 * 15  # 15 minutes
+NEGATIVE_TTL = 60 * 5  # queries that returned nothing; retried sooner
+ETAG_TTL = 60 * 60 * 24  # how long a response body is kept for revalidation
 TIMEOUT = 6
 RETRIES = 2
+BASE_DELAY = 0.5   # seconds, doubled per attempt
+MAX_DELAY = 8      # ceiling for any single wait
+JITTER = 0.5       # random spread so retrying clients don't sync up
 
-def _hash_key(prefix: str, raw: str) -> str:
-    h = hashlib.md5(raw.encode("utf-8")).hexdigest()
-    return f"{prefix}:{h}"
+# Shared session so MB + CAA calls reuse keep-alive connections instead of
+# paying a TCP+TLS handshake per request. Backoff lives in _mb_get, so the
+# adapter does no retries of its own.
+_session = requests.Session()
+# Accept-Encoding is explicit rather than left to the library default: MB
+# recording payloads with tags+release-groups compress ~10x, and we want the
+# bandwidth saving guaranteed for every call on this session.
+_session.headers.update({
+    "User-Agent": USER_AGENT,
+    "Accept-Encoding": "gzip, deflate",
+})
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
 
-def _mb_get(params):
+def _retry_delay(attempt: int, retry_after=None) -> float:
+    """Backoff for a retry attempt: honor Retry-After when given, else exponential."""
+    if retry_after:
+        try:
+            return min(MAX_DELAY, float(retry_after))
+        except ValueError:
+            pass
+    delay = min(MAX_DELAY, BASE_DELAY * 2 ** attempt)
+    return delay * (1 + random.random() * JITTER)
+
+def _mb_get(params, etag_key=None):
+    # When the caller's parsed-result cache has expired, an (etag, body)
+    # pair kept under etag_key lets us revalidate with If-None-Match: a 304
+    # answer costs headers only and we reuse the stored body.
+    stale = cache.get(etag_key) if etag_key else None
+    headers = {"If-None-Match": stale[0]} if stale else None
     last_err = None
-    for _ in range(RETRIES + 1):
+    for attempt in range(RETRIES + 1):
         try:
-            r = requests.get(
-                BASE_URL,
-                params=params,
-                headers={"User-Agent": USER_AGENT},
-                timeout=TIMEOUT,
-            )
+            r = _session.get(BASE_URL, params=params, headers=headers, timeout=TIMEOUT)
+            if r.status_code == 304 and stale:
+                cache.touch(etag_key, ETAG_TTL)
+                return stale[1]
             r.raise_for_status()
-            return r.json()
+            # json.loads on the raw bytes skips requests' charset detection
+            # pass (MB always sends UTF-8, which the json module handles).
+            # Re-wrap parse errors as requests' own exception so a malformed
+            # 200 body (truncated response, proxy error page) is retried
+            # below and degrades in the callers like any request failure.
+            try:
+                data = json.loads(r.content)
+            except ValueError as e:
+                raise requests.exceptions.InvalidJSONError(e, request=r.request)
+            etag = r.headers.get("ETag")
+            if etag_key and etag:
+                cache.set(etag_key, (etag, data), ETAG_TTL)
+            return data
+        except requests.HTTPError as e:
+            status_code = e.response.status_code if e.response is not None else None
+            # 429/503 are throttling/overload: back off (Retry-After if the server
+            # sent one). Other 4xx won't succeed on retry, so fail fast.
+            if status_code in (429, 503):
+                last_err = e
+                if attempt < RETRIES:
+                    time.sleep(_retry_delay(attempt, e.response.headers.get("Retry-After")))
+            elif status_code is not None and 400 <= status_code < 500:
+                raise
+            else:
+                last_err = e
+                if attempt < RETRIES:
+                    time.sleep(_retry_delay(attempt))
         except requests.RequestException as e:
             last_err = e
-            time.sleep(0.5)
+            if attempt < RETRIES:
+                time.sleep(_retry_delay(attempt))
     raise last_err
 
+# Built once at import: a single translate() pass instead of one full string
+# scan (and intermediate copy) per chained str.replace. Covers the full
+# Lucene special-character set; the two-character operators && and || need
+# the regex since translate() only maps single characters. The regex runs
+# after translate so it doesn't see the backslashes translate inserts.
+_LUCENE_ESCAPES = str.maketrans({c: "\\" + c for c in '\\+-!(){}[]^"~*?:/'})
+_LUCENE_AND_OR = re.compile(r"(&&|\|\|)")
+
 def _escape_lucene(value: str) -> str:
     if value is None:
         return ""
-    return value.replace("\\", "\\\\").replace('"', '\\"')
-
-def _artist_name(rec) -> str:
-    return (rec.get("artist-credit", [{}])[0].get("name") or "").strip()
+    return _LUCENE_AND_OR.sub(r"\\\1", value.translate(_LUCENE_ESCAPES))
 
-def _artist_mbid(rec) -> str:
-    ac = rec.get("artist-credit", [{}])[0]
+def _artist_info(rec):
+    """Name and MBID from a recording's first artist credit, in one walk."""
+    credits = rec.get("artist-credit") or ()
+    if not credits:
+        return "", ""
+    ac = credits[0]
     artist = ac.get("artist") or {}
-    return (artist.get("id") or "").strip()
+    return (ac.get("name") or "").strip(), (artist.get("id") or "").strip()
 
 def search_musicbrainz_track(track_name: str, artist_hint: Optional[str] = None):
     """
@@ -58,9 +124,12 @@ def search_musicbrainz_track(track_name: str, artist_hint: Optional[str] = None)
 
     raw_title = track_name.strip()
     raw_artist = (artist_hint or "").strip()
+    # canonicalize once with casefold (handles ß/İ-style titles that plain
+    # lower() misses); reused for the cache key and artist comparisons below
+    artist_key = raw_artist.casefold()
 
     # cache key includes artist hint so different artists don't collide
-    cache_key = _hash_key("mbz:first", f"{raw_title.lower()}|{raw_artist.lower()}")
+    cache_key = f"mbz:first:{raw_title.casefold()}|{artist_key}"
     cached = cache.get(cache_key)
     if cached:
         return cached
@@ -72,7 +141,10 @@ def search_musicbrainz_track(track_name: str, artist_hint: Optional[str] = None)
         q = f'recording:"{_escape_lucene(raw_title)}"'
 
     try:
-        data = _mb_get({"query": q, "fmt": "json", "limit": 10})
+        data = _mb_get(
+            {"query": q, "fmt": "json", "limit": 10},
+            etag_key=f"mbz:etag:{cache_key}",
+        )
     except requests.RequestException as e:
         print(f"[MB] error: {e}")
         return None
@@ -83,7 +155,7 @@ def search_musicbrainz_track(track_name: str, artist_hint: Optional[str] = None)
 
     # If artist_hint is provided, try exact artist match first
     if raw_artist:
-        cand = [r for r in recs if _artist_name(r).lower() == raw_artist.lower()]
+        cand = [r for r in recs if _artist_info(r)[0].casefold() == artist_key]
         if cand:
             recs = cand
 
@@ -92,11 +164,12 @@ def search_musicbrainz_track(track_name: str, artist_hint: Optional[str] = None)
         return len(r.get("releases") or [])
 
     best = max(recs, key=release_count)
+    best_artist, best_artist_mbid = _artist_info(best)
 
     result = {
         "title": best.get("title"),
-        "artist": _artist_name(best) or "Unknown Artist",
-        "artist_mbid": _artist_mbid(best) or "",
+        "artist": best_artist or "Unknown Artist",
+        "artist_mbid": best_artist_mbid or "",
         "track_id": best.get("id"),
         "release-group": best.get("release-group") or {},
     }
@@ -108,9 +181,12 @@ def search_musicbrainz_recordings(query: str, limit: int = 25, offset: int = 0):
     """Generic multi-recording search by a Lucene query string."""
     if not query:
         return []
-    cache_key = _hash_key("mbz:recs", f"{limit}:{offset}:{query}")
+    cache_key = f"mbz:recs:{limit}:{offset}:{query}"
     cached = cache.get(cache_key)
-    if cached:
+    # An empty list is a valid (negative) cache hit: a query that found
+    # nothing a moment ago won't find anything now either, so don't re-issue
+    # it — this covers artist/arid queries from search_recordings_by_artist*.
+    if cached is not None:
         return cached
     try:
         data = _mb_get({
@@ -119,16 +195,36 @@ def search_musicbrainz_recordings(query: str, limit: int = 25, offset: int = 0):
             "limit": limit,
             "offset": offset,
             "inc": "tags+release-groups",   # request extra info
-        })
+        }, etag_key=f"mbz:etag:{cache_key}")
     except requests.RequestException as e:
         print(f"[MB] error: {e}")
         return []
     recs = data.get("recordings") or []
-    cache.set(cache_key, recs, CACHE_TTL)
+    cache.set(cache_key, recs, CACHE_TTL if recs else NEGATIVE_TTL)
     return recs
 
 
 
+def search_musicbrainz_recordings_bulk(mbids, chunk_size: int = 50):
+    """
+    Look up many recordings by MBID in as few requests as possible.
+    Joins ids into OR'd Lucene queries (rid:A OR rid:B ...) in chunks, so N
+    lookups cost ceil(N/chunk_size) requests instead of N.
+    Returns a {mbid: recording} dict; ids MusicBrainz doesn't know are absent.
+    """
+    results = {}
+    mbids = [m for m in mbids if m]
+    for i in range(0, len(mbids), chunk_size):
+        batch = mbids[i:i + chunk_size]
+        q = " OR ".join(f"rid:{mbid}" for mbid in batch)
+        recs = search_musicbrainz_recordings(q, limit=len(batch))
+        for rec in recs:
+            rid = rec.get("id")
+            if rid:
+                results[rid] = rec
+    return results
+
+
 def search_recordings_by_artist(artist_name: str, exclude_title: Optional[str] = None, limit: int = 25):
     """
     Query recordings by artist, optionally excluding a specific title.
@@ -157,16 +253,46 @@ def search_recordings_by_artist_mbid(artist_mbid: str, exclude_title: Optional[s
     return search_musicbrainz_recordings(q, limit=limit)
 
 
+# Per-process TTL cache for cover art, {release_group_id: (url_or_None, expiry)}.
+# Most release groups have no art at all, so caching the None result matters:
+# without it every repeat miss is a full CAA round trip ending in a 404.
+_cover_art_cache = {}
+COVER_ART_TTL = 60 * 60     # hits
+COVER_ART_NEG_TTL = 60 * 5  # misses kept short so newly added art shows up
+_COVER_ART_MAX = 5000
+
+
 def fetch_cover_art(release_group_id):
     if not release_group_id:
         return None
+
+    entry = _cover_art_cache.get(release_group_id)
+    if entry is not None:
+        value, expiry = entry
+        if expiry > time.monotonic():
+            return value
+
+    image = None
     url = f"https://coverartarchive.org/release-group/{release_group_id}"
     try:
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
-        if "images" in data and data["images"]:
-            return data["images"][0].get("image")
+        resp = _session.get(url, timeout=5)
+        if resp.status_code != 404:  # CAA answers 404 for "no art": cacheable miss
+            resp.raise_for_status()
+            data = json.loads(resp.content)
+            if "images" in data and data["images"]:
+                image = data["images"][0].get("image")
     except Exception:
+        # Transient failure — don't cache, so the next request retries.
         return None
 
+    if len(_cover_art_cache) >= _COVER_ART_MAX:
+        # Evict the oldest tenth (dicts keep insertion order) instead of
+        # wiping the whole cache at once. pop() with a default because the
+        # view fans fetch_cover_art out across threads: two of them can
+        # enter this branch with overlapping key snapshots.
+        for rgid in list(_cover_art_cache)[:_COVER_ART_MAX // 10]:
+            _cover_art_cache.pop(rgid, None)
+    ttl = COVER_ART_TTL if image else COVER_ART_NEG_TTL
+    _cover_art_cache[release_group_id] = (image, time.monotonic() + ttl)
+    return image
+
@@ -0,0 +1,140 @@
+import time
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from django.core.cache import cache
+
+import api.musicbrainz as mb
+from api.cache import LRUObjectCache
+from api.musicbrainz import search_musicbrainz_recordings_bulk
+
+
+# --- Helpers ---
+
+def make_cache(name, max_entries=3):
+    return LRUObjectCache(name, {"OPTIONS": {"MAX_ENTRIES": max_entries}})
+
+
+def fake_response(status_code=200, content=b"{}", headers=None):
+    r = MagicMock()
+    r.status_code = status_code
+    r.content = content
+    r.headers = headers or {}
+    if status_code >= 400:
+        r.raise_for_status.side_effect = requests.HTTPError(response=r)
+    else:
+        r.raise_for_status.return_value = None
+    return r
+
+
+# --- Tests for api.cache.LRUObjectCache ---
+
+def test_cache_get_returns_stored_object_unpickled():
+    c = make_cache("t-setget")
+    value = {"recordings": [{"id": "t1"}]}
+    c.set("k", value, 30)
+    assert c.get("k") is value
+    assert c.get("missing", "default") == "default"
+
+
+def test_cache_entry_expires():
+    c = make_cache("t-expiry")
+    c.set("k", "v", 0.01)
+    time.sleep(0.02)
+    assert c.get("k") is None
+
+
+def test_cache_evicts_least_recently_used():
+    c = make_cache("t-lru", max_entries=3)
+    c.set("a", 1, 30)
+    c.set("b", 2, 30)
+    c.set("c", 3, 30)
+    c.get("a")  # refresh "a"; "b" is now the oldest
+    c.set("d", 4, 30)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3 and c.get("d") == 4
+
+
+def test_cache_add_and_touch():
+    c = make_cache("t-add")
+    assert c.add("k", 1, 30) is True
+    assert c.add("k", 2, 30) is False
+    assert c.get("k") == 1
+    assert c.touch("k", 30) is True
+    assert c.touch("gone", 30) is False
+
+
+# --- Tests for _mb_get retry policy ---
+
+def test_mb_get_fails_fast_on_client_error():
+    with patch.object(mb._session, "get", return_value=fake_response(404)) as get:
+        with pytest.raises(requests.HTTPError):
+            mb._mb_get({"query": "x"})
+    assert get.call_count == 1  # no retries on unrecoverable 4xx
+
+
+def test_mb_get_retries_429_and_honors_retry_after():
+    responses = [
+        fake_response(429, headers={"Retry-After": "2"}),
+        fake_response(content=b'{"recordings": []}'),
+    ]
+    with patch.object(mb._session, "get", side_effect=responses) as get, \
+         patch("api.musicbrainz.time.sleep") as sleep:
+        assert mb._mb_get({"query": "x"}) == {"recordings": []}
+    assert get.call_count == 2
+    sleep.assert_called_once_with(2.0)
+
+
+def test_mb_get_retries_503_until_exhausted():
+    responses = [fake_response(503)] * (mb.RETRIES + 1)
+    with patch.object(mb._session, "get", side_effect=responses) as get, \
+         patch("api.musicbrainz.time.sleep"):
+        with pytest.raises(requests.HTTPError):
+            mb._mb_get({"query": "x"})
+    assert get.call_count == mb.RETRIES + 1
+
+
+def test_mb_get_malformed_body_raises_request_exception():
+    # A truncated body / proxy error page must stay catchable as a
+    # RequestException so callers degrade to None/[] instead of 500ing.
+    with patch.object(mb._session, "get", return_value=fake_response(content=b"<html>")), \
+         patch("api.musicbrainz.time.sleep"):
+        with pytest.raises(requests.RequestException):
+            mb._mb_get({"query": "x"})
+
+
+def test_mb_get_revalidates_with_etag():
+    etag_key = "mbz:etag:test-revalidate"
+    cache.delete(etag_key)
+    first = fake_response(content=b'{"recordings": [1]}', headers={"ETag": '"abc"'})
+    with patch.object(mb._session, "get", return_value=first):
+        assert mb._mb_get({"query": "x"}, etag_key=etag_key) == {"recordings": [1]}
+
+    # Second call sends If-None-Match and reuses the stored body on 304
+    with patch.object(mb._session, "get", return_value=fake_response(304)) as get:
+        assert mb._mb_get({"query": "x"}, etag_key=etag_key) == {"recordings": [1]}
+    assert get.call_args.kwargs["headers"] == {"If-None-Match": '"abc"'}
+
+
+# --- Tests for search_musicbrainz_recordings_bulk ---
+
+@patch("api.musicbrainz.search_musicbrainz_recordings")
+def test_bulk_lookup_chunks_ids(mock_search):
+    def search(query, limit=25):
+        batch = [part.split("rid:")[1] for part in query.split(" OR ")]
+        assert len(batch) == limit and limit <= 50
+        return [{"id": mbid} for mbid in batch]
+
+    mock_search.side_effect = search
+    ids = [f"id-{i}" for i in range(120)]
+    result = search_musicbrainz_recordings_bulk(ids)
+
+    assert mock_search.call_count == 3  # 50 + 50 + 20
+    assert set(result) == set(ids)
+    assert result["id-7"] == {"id": "id-7"}
+
+
+@patch("api.musicbrainz.search_musicbrainz_recordings")
+def test_bulk_lookup_skips_falsy_ids(mock_search):
+    assert search_musicbrainz_recordings_bulk(["", None]) == {}
+    mock_search.assert_not_called()
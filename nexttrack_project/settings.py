@@ -100,6 +100,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Pickle-free in-process LRU cache for MusicBrainz responses (see api/cache.py)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'api.cache.LRUObjectCache',
+        'LOCATION': 'mbz',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 